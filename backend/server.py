@@ -1,21 +1,32 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, UploadFile
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel
-import json
+import orjson
 import google.generativeai as genai
-import base64
+import binascii
+from io import BytesIO
+from PIL import Image, ImageOps
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 from jose import jwt, JWTError
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional
+from cachetools import TTLCache
+import hashlib
+import re
 import secrets
+import threading
+import time
 
 
 ROOT_DIR = Path(__file__).parent
@@ -33,7 +44,7 @@ client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -45,7 +56,164 @@ security = HTTPBearer()
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY", "")
 JWT_SECRET = os.environ.get("JWT_SECRET", secrets.token_urlsafe(32))
 JWT_ALGORITHM = "HS256"
+_JWT_ALGORITHMS = [JWT_ALGORITHM]
+# Our own tokens carry no aud/iss claims; exp and sub are mandatory
+_JWT_OPTIONS = {
+    "verify_aud": False,
+    "verify_iss": False,
+    "require_exp": True,
+    "require_sub": True,
+}
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+MAX_IMAGE_BYTES = 11 * 1024 * 1024
+MAX_IMAGE_BASE64 = (MAX_IMAGE_BYTES + 2) // 3 * 4
+# Larger images are downscaled before being sent to Gemini. Images with more
+# pixels than MAX_IMAGE_PIXELS are sent as-is rather than decoded, since a
+# small compressed upload can inflate to gigabytes of pixel data
+MAX_IMAGE_DIMENSION = 1024
+MAX_IMAGE_PIXELS = 25_000_000
+
+# Only the profile fields exposed to clients are read from user documents
+USER_PROJECTION = {"email": 1, "name": 1, "picture": 1}
+
+# Short-lived cache of verified tokens: sha256(token) -> (exp, user)
+TOKEN_CACHE_TTL_SECONDS = 10
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+# Google ID token verification: a keep-alive transport per worker thread
+# (requests.Session isn't thread-safe) and a short cache of
+# sha256(id_token) -> (exp, idinfo)
+_google_req_local = threading.local()
+_google_id_cache = TTLCache(maxsize=2000, ttl=60)
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+
+# Upper bound on each startup connection warm-up
+WARMUP_TIMEOUT_SECONDS = 10
+
+# Step-by-step logs returned in /analyze error details; opt-in since they are
+# built on every request
+DEBUG_LOGS = os.environ.get("SCAM_DEBUG_LOGS") == "1"
+
+# Gemini model, configured once at startup and shared across requests
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+gemini_model: Optional[genai.GenerativeModel] = None
+
+# Scam analysis instructions, passed as the model's system instruction. The
+# client still sends it with every request; keeping it constant only saves
+# rebuilding the prompt string per call
+SYSTEM_MESSAGE = """You are a scam detection expert. Analyze ANY image for potential scams, fraud, or suspicious content. This includes:
+- Emails and letters
+- Social media profiles (Facebook, Instagram, LinkedIn, Twitter, etc.)
+- Text messages and chat screenshots
+- Announcements and notices
+- Advertisements and promotional content
+- Investment opportunities
+- Dating profiles
+- Marketplace listings
+- Job postings
+- Any other content that could potentially be a scam
+
+Your response must ALWAYS be in JSON format with this exact structure:
+{
+    "score": <number 0-100>,
+    "risk_level": "<safe|suspicious|scam>",
+    "summary": "<brief summary in simple language>",
+    "indicators": [
+        {
+            "title": "<indicator name>",
+            "explanation": "<simple explanation that a grandmother can understand>",
+            "severity": "<low|medium|high>"
+        }
+    ]
+}
+
+Score guide:
+- 0-30: Safe (legitimate or low risk)
+- 31-60: Suspicious (needs caution, verify before trusting)
+- 61-100: Scam (dangerous, likely fraudulent)
+
+Common scam indicators across all platforms:
+
+**Emails & Messages:**
+- Urgent/threatening language ("act now or lose access")
+- Requests for passwords, SSN, or banking info
+- Suspicious sender addresses or domains
+- Poor grammar, spelling errors, or odd formatting
+- Unexpected prizes, refunds, or inheritance claims
+- Suspicious links or attachments
+
+**Social Media Profiles:**
+- Newly created accounts with few posts/followers
+- Stock photos or stolen profile pictures
+- Promises of easy money, get-rich-quick schemes
+- Romantic advances from strangers (romance scams)
+- Impersonation of celebrities, officials, or brands
+- Requests to move conversation off-platform quickly
+- No mutual friends or suspicious friend lists
+- Profile information inconsistencies
+
+**Investment & Money Schemes:**
+- Guaranteed high returns with no risk
+- Pyramid or multi-level marketing schemes
+- Cryptocurrency "opportunities" with urgent deadlines
+- Requests for upfront payments or "processing fees"
+- Pressure to invest quickly without research time
+
+**Marketplace & Job Postings:**
+- Deals that are too good to be true
+- Requests for payment via untraceable methods (gift cards, wire transfer, crypto)
+- Job offers requiring upfront payment for training/equipment
+- Overpayment scams with refund requests
+- Vague job descriptions with high pay promises
+
+**Red Flags Across All Types:**
+- Requests for money or gift cards
+- Pressure tactics and artificial urgency
+- Requests to bypass normal procedures
+- Unsolicited contact
+- Too good to be true offers
+- Inconsistent or vague information
+- Requests to keep things secret
+- Poor communication or evasive answers
+
+IMPORTANT: Explain everything in simple, grandma-friendly language. Be helpful and clear about WHY something is suspicious, not just THAT it's suspicious."""
+
+ANALYSIS_PROMPT = "Analyze this image for scam indicators. It could be anything - an email, social media profile, text message, advertisement, job posting, or any other content. Provide a detailed analysis with a scam score from 0-100 and explain each indicator in simple language that anyone can understand."
+
+# Magic-byte prefixes of the image formats Gemini accepts
+_IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+_HEIF_BRANDS = {
+    b"heic": "image/heic",
+    b"heix": "image/heic",
+    b"mif1": "image/heif",
+    b"msf1": "image/heif",
+}
+
+# Markdown code fences around the model's JSON, and a salvage pattern for
+# JSON embedded in surrounding prose
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Cap concurrent upstream Gemini calls per worker. Calls made through the
+# shared model reuse one async gRPC client, so concurrent requests are
+# multiplexed over a single HTTP/2 connection rather than batched here.
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "5"))
+_gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+# Cap concurrent image downscales per worker; each one holds a decoded image
+# in memory and a CPU core while it runs
+IMAGE_RESIZE_MAX_CONCURRENCY = int(os.environ.get("IMAGE_RESIZE_MAX_CONCURRENCY", "2"))
+_resize_semaphore = asyncio.Semaphore(IMAGE_RESIZE_MAX_CONCURRENCY)
+
+# Identical images (e.g. a viral scam screenshot) share one Gemini call:
+# recent results are cached and concurrent requests wait on the first one.
+# Keys are blake2b digests of the decoded image bytes.
+ANALYSIS_CACHE_TTL_SECONDS = 300
+_analysis_cache = TTLCache(maxsize=1000, ttl=ANALYSIS_CACHE_TTL_SECONDS)
+_inflight_analyses: dict[bytes, asyncio.Future] = {}
 
 
 # Define Models
@@ -84,18 +252,92 @@ class AuthResponse(BaseModel):
 # Helper functions
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode["exp"] = int(time.time()) + ACCESS_TOKEN_EXPIRE_MINUTES * 60
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 
+def _downscale_image(image_data: bytes) -> Optional[bytes]:
+    """
+    Shrink an image to fit MAX_IMAGE_DIMENSION and re-encode it as JPEG.
+    Returns None if the image is already small enough.
+    """
+    with Image.open(BytesIO(image_data)) as img:
+        if max(img.size) <= MAX_IMAGE_DIMENSION:
+            return None
+        if img.width * img.height > MAX_IMAGE_PIXELS:
+            return None
+        if img.mode == "P":
+            # Palette images can only be resized nearest-neighbour, which
+            # mangles text, so expand them first
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        # Shrink before anything else; for JPEGs this decodes at reduced size
+        img.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.LANCZOS)
+        # Re-encoding drops EXIF, so bake the camera orientation into the pixels
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA"):
+            # JPEG has no alpha; flatten onto white so transparent areas don't
+            # turn into whatever colour was stored under them (usually black)
+            flattened = Image.new("RGB", img.size, "white")
+            flattened.paste(img, mask=img.getchannel("A"))
+            img = flattened
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, "JPEG", quality=85, optimize=False)
+        return buffer.getvalue()
+
+
+def _google_request() -> google_requests.Request:
+    """
+    Return the calling thread's google-auth transport, creating it on first use
+    """
+    request = getattr(_google_req_local, "request", None)
+    if request is None:
+        request = _google_req_local.request = google_requests.Request()
+    return request
+
+
+def _verify_google_id_token_sync(token: str) -> dict:
+    return id_token.verify_oauth2_token(token, _google_request())
+
+
+async def _verify_google_id_token(token: str) -> dict:
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = _google_id_cache.get(cache_key)
+    if cached is not None:
+        exp, idinfo = cached
+        if exp > time.time():
+            return idinfo
+        _google_id_cache.pop(cache_key, None)
+
+    # Signature checks (and occasional cert fetches) block, so run them in a
+    # worker thread. Raises ValueError for invalid tokens, which are never cached
+    idinfo = await asyncio.to_thread(_verify_google_id_token_sync, token)
+    _google_id_cache[cache_key] = (idinfo["exp"], idinfo)
+    return idinfo
+
+
+def get_model() -> Optional[genai.GenerativeModel]:
+    return gemini_model
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
+    token = credentials.credentials
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(cache_key)
+    if cached is not None:
+        exp, user = cached
+        if exp > time.time():
+            return user
+        _token_cache.pop(cache_key, None)
+
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(
+            token, JWT_SECRET, algorithms=_JWT_ALGORITHMS, options=_JWT_OPTIONS
+        )
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(
@@ -103,10 +345,12 @@ async def get_current_user(
             )
 
         # Get user from database
-        user = await db.users.find_one({"_id": user_id})
+        user = await db.users.find_one({"_id": user_id}, USER_PROJECTION)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
 
+        # Only successfully verified tokens are cached
+        _token_cache[cache_key] = (payload["exp"], user)
         return user
     except JWTError:
         raise HTTPException(
@@ -127,9 +371,7 @@ async def google_auth(auth_request: GoogleAuthRequest):
     try:
         # Verify the token with Google
         # Note: In production, you should configure GOOGLE_CLIENT_ID in env
-        idinfo = id_token.verify_oauth2_token(
-            auth_request.id_token, google_requests.Request()
-        )
+        idinfo = await _verify_google_id_token(auth_request.id_token)
 
         # Extract user information
         user_id = idinfo["sub"]
@@ -137,18 +379,20 @@ async def google_auth(auth_request: GoogleAuthRequest):
         name = idinfo.get("name")
         picture = idinfo.get("picture")
 
-        # Check if user exists, if not create new user
-        user = await db.users.find_one({"_id": user_id})
-        if not user:
-            user = {
-                "_id": user_id,
-                "email": email,
-                "name": name,
-                "picture": picture,
-                "provider": "google",
-                "created_at": datetime.utcnow(),
-            }
-            await db.users.insert_one(user)
+        # Create the user on first sign-in, in a single round trip
+        await db.users.update_one(
+            {"_id": user_id},
+            {
+                "$setOnInsert": {
+                    "email": email,
+                    "name": name,
+                    "picture": picture,
+                    "provider": "google",
+                    "created_at": datetime.utcnow(),
+                }
+            },
+            upsert=True,
+        )
 
         # Create access token
         access_token = create_access_token(data={"sub": user_id})
@@ -180,31 +424,27 @@ async def apple_auth(auth_request: AppleAuthRequest):
         user_id = unverified.get("sub")
         email = unverified.get("email")
 
-        # Check if user exists
-        user = await db.users.find_one({"_id": user_id})
-
-        # Handle first-time sign in with user data
-        if not user and auth_request.user_data:
-            user = {
-                "_id": user_id,
-                "email": email or auth_request.user_data.get("email"),
-                "name": auth_request.user_data.get("fullName", {}).get(
-                    "givenName", "User"
-                ),
-                "provider": "apple",
-                "created_at": datetime.utcnow(),
-            }
-            await db.users.insert_one(user)
-        elif not user:
-            # User exists but we don't have their data
-            user = {
-                "_id": user_id,
-                "email": email,
-                "name": "User",
-                "provider": "apple",
-                "created_at": datetime.utcnow(),
-            }
-            await db.users.insert_one(user)
+        # Apple only sends user data on first sign-in
+        name = "User"
+        if auth_request.user_data:
+            email = email or auth_request.user_data.get("email")
+            name = auth_request.user_data.get("fullName", {}).get("givenName", "User")
+
+        # Fetch the user, creating it on first sign-in, in a single round trip
+        user = await db.users.find_one_and_update(
+            {"_id": user_id},
+            {
+                "$setOnInsert": {
+                    "email": email,
+                    "name": name,
+                    "provider": "apple",
+                    "created_at": datetime.utcnow(),
+                }
+            },
+            projection=USER_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
 
         # Create access token
         access_token = create_access_token(data={"sub": user_id})
@@ -235,6 +475,19 @@ async def get_me(current_user: dict = Depends(get_current_user)):
     }
 
 
+class _NullList(list):
+    """
+    A list that silently discards appended items
+    """
+
+    def append(self, item) -> None:
+        pass
+
+
+def _new_error_logs() -> list[str]:
+    return [] if DEBUG_LOGS else _NullList()
+
+
 class ErrorDetail(BaseModel):
     error: str
     details: str
@@ -242,12 +495,284 @@ class ErrorDetail(BaseModel):
     logs: Optional[list[str]] = None
 
 
+def _ensure_ai_service(
+    model: Optional[genai.GenerativeModel], error_logs: list[str]
+) -> None:
+    """
+    Raise an HTTPException if the AI service is not available
+    """
+    # Check API key
+    if not GOOGLE_API_KEY:
+        error_logs.append("❌ API key not configured")
+        logger.error("GOOGLE_API_KEY not found in environment")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Configuration Error",
+                "details": "AI service is not properly configured. Please contact support.",
+                "logs": error_logs,
+            },
+        )
+
+    error_logs.append("✅ API key found")
+
+    # Gemini is initialized once at startup
+    if model is None:
+        error_logs.append("❌ AI service not initialized")
+        logger.error("Gemini model is not initialized")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "AI Service Error",
+                "details": "Could not connect to AI service. Please try again later.",
+                "logs": error_logs,
+            },
+        )
+
+    error_logs.append("✅ AI service initialized")
+
+
+async def _analyze_image_data(
+    image_data: bytes,
+    model: genai.GenerativeModel,
+    error_logs: list[str],
+    mime_type: str = "image/jpeg",
+) -> ScamAnalysisResponse:
+    """
+    Run the scam analysis on decoded image bytes, reusing the result of a
+    recent or in-flight analysis of the same image
+    """
+    key = hashlib.blake2b(image_data, digest_size=16).digest()
+    cached = _analysis_cache.get(key)
+    if cached is not None:
+        error_logs.append("✅ Reused recent analysis")
+        logger.info("Returning cached analysis for identical image")
+        return cached
+
+    inflight = _inflight_analyses.get(key)
+    if inflight is not None:
+        logger.info("Waiting for in-flight analysis of identical image")
+        try:
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise
+            # The first request was cancelled; analyze the image ourselves
+        return await _run_image_analysis(image_data, model, error_logs, mime_type)
+
+    # No await between the lookup and registration, so no lock is needed
+    future = asyncio.get_running_loop().create_future()
+    _inflight_analyses[key] = future
+    try:
+        result = await _run_image_analysis(image_data, model, error_logs, mime_type)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Waiters re-raise it; don't warn when there are none
+        future.exception()
+        raise
+    else:
+        _analysis_cache[key] = result
+        future.set_result(result)
+        return result
+    finally:
+        _inflight_analyses.pop(key, None)
+
+
+async def _run_image_analysis(
+    image_data: bytes,
+    model: genai.GenerativeModel,
+    error_logs: list[str],
+    mime_type: str,
+) -> ScamAnalysisResponse:
+    """
+    Run the scam analysis on decoded image bytes
+    """
+    # Downscale large images to cut upload size and API cost; Pillow is
+    # CPU-bound so it runs in a worker thread
+    try:
+        async with _resize_semaphore:
+            resized = await asyncio.to_thread(_downscale_image, image_data)
+    except Exception as e:
+        logger.warning(f"Could not preprocess image, sending original: {e}")
+        resized = None
+    if resized is not None:
+        image_data = resized
+        mime_type = "image/jpeg"
+        error_logs.append("✅ Image resized for analysis")
+
+    # Send request to Gemini and get response
+    try:
+        logger.info("Sending request to AI service")
+        # Upload the image data
+        image_part = {"mime_type": mime_type, "data": image_data}
+        async with _gemini_semaphore:
+            response = await model.generate_content_async([ANALYSIS_PROMPT, image_part])
+        error_logs.append("✅ AI analysis completed")
+        logger.info("Received response from AI service")
+        response_text = response.text
+    except Exception as e:
+        error_logs.append(f"❌ AI analysis failed: {str(e)}")
+        logger.error(f"AI service request failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "AI Analysis Failed",
+                "details": f"The AI service encountered an error: {str(e)}. This might be a temporary issue - please try again.",
+                "logs": error_logs,
+            },
+        )
+
+    # Parse the JSON response
+    try:
+        # Remove markdown code blocks if present
+        response_text = _FENCE_RE.sub("", response_text).strip()
+
+        if DEBUG_LOGS:
+            error_logs.append(
+                f"📄 Raw AI response received ({len(response_text)} chars)"
+            )
+
+        # Parse JSON
+        try:
+            analysis_data = orjson.loads(response_text)
+        except orjson.JSONDecodeError:
+            # Fall back to the outermost {...} block in the response
+            match = _JSON_OBJECT_RE.search(response_text)
+            if match is None:
+                raise
+            analysis_data = orjson.loads(match.group(0))
+        error_logs.append("✅ Response parsed successfully")
+
+        # Validate required fields
+        required_fields = ["score", "risk_level", "indicators", "summary"]
+        missing_fields = [
+            field for field in required_fields if field not in analysis_data
+        ]
+        if missing_fields:
+            error_logs.append(
+                f"❌ Missing fields in response: {', '.join(missing_fields)}"
+            )
+            raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
+
+        error_logs.append("✅ Response validation passed")
+
+    except orjson.JSONDecodeError as e:
+        error_logs.append(f"❌ JSON parsing failed: {str(e)}")
+        error_logs.append(f"📄 Response preview: {response_text[:200]}...")
+        logger.error(f"JSON parsing error: {e}")
+        logger.error(f"Response text: {response_text}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Response Parsing Error",
+                "details": f"Failed to parse AI response. The AI returned invalid data format: {str(e)}",
+                "logs": error_logs,
+            },
+        )
+    except ValueError as e:
+        error_logs.append(f"❌ Validation failed: {str(e)}")
+        logger.error(f"Response validation error: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Invalid Response Format",
+                "details": f"AI response is missing required information: {str(e)}",
+                "logs": error_logs,
+            },
+        )
+
+    # Create response model
+    try:
+        result = ScamAnalysisResponse.model_validate(analysis_data)
+        error_logs.append("✅ Analysis completed successfully!")
+        logger.info(f"Analysis completed successfully with score: {result.score}")
+
+        return result
+    except Exception as e:
+        error_logs.append(f"❌ Failed to create response: {str(e)}")
+        logger.error(f"Failed to create response model: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Response Creation Error",
+                "details": f"Failed to format the analysis results: {str(e)}",
+                "logs": error_logs,
+            },
+        )
+
+
+def _sniff_image_type(image_data: bytes) -> Optional[str]:
+    """
+    Detect the image MIME type from its leading bytes
+    """
+    for signature, mime_type in _IMAGE_SIGNATURES:
+        if image_data.startswith(signature):
+            return mime_type
+    if image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+        return "image/webp"
+    if image_data[4:8] == b"ftyp":
+        return _HEIF_BRANDS.get(image_data[8:12])
+    return None
+
+
+def _detect_image_type(image_data: bytes, error_logs: list[str]) -> str:
+    """
+    Return the image MIME type, rejecting data that is not a supported image
+    so no API quota is spent on it
+    """
+    mime_type = _sniff_image_type(image_data)
+    if mime_type is None:
+        error_logs.append("❌ Unsupported image format")
+        logger.error("Image data is not a supported image format")
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "Unsupported Image",
+                "details": "The file is not a supported image. Please upload a JPEG, PNG, WEBP or HEIC image.",
+                "logs": error_logs,
+            },
+        )
+    return mime_type
+
+
+def _image_too_large_error(error_logs: list[str]) -> HTTPException:
+    error_logs.append("❌ Image too large")
+    logger.error("Image exceeds size limit")
+    return HTTPException(
+        status_code=413,
+        detail={
+            "error": "Image Too Large",
+            "details": f"The image must be smaller than {MAX_IMAGE_BYTES // (1024 * 1024)}MB. Please try a smaller image.",
+            "logs": error_logs,
+        },
+    )
+
+
+def _unexpected_analysis_error(e: Exception, error_logs: list[str]) -> HTTPException:
+    error_logs.append(f"❌ Unexpected error: {str(e)}")
+    logger.error(f"Unexpected error analyzing image: {e}", exc_info=True)
+    return HTTPException(
+        status_code=500,
+        detail={
+            "error": "Unexpected Error",
+            "details": f"An unexpected error occurred: {str(e)}. Please try again or contact support if the issue persists.",
+            "logs": error_logs,
+        },
+    )
+
+
 @api_router.post("/analyze", response_model=ScamAnalysisResponse)
-async def analyze_image(request: ScamAnalysisRequest):
+async def analyze_image(
+    request: ScamAnalysisRequest,
+    model: Optional[genai.GenerativeModel] = Depends(get_model),
+):
     """
     Analyze an image (email or letter) for scam indicators
     """
-    error_logs = []
+    error_logs = _new_error_logs()
     try:
         # Validate image data
         if not request.image_base64:
@@ -262,123 +787,22 @@ async def analyze_image(request: ScamAnalysisRequest):
                 },
             )
 
+        # Reject oversized payloads before paying for the decode
+        if len(request.image_base64) > MAX_IMAGE_BASE64:
+            raise _image_too_large_error(error_logs)
+
         error_logs.append("✅ Image data validated")
         logger.info("Starting image analysis")
 
-        # Check API key
-        if not GOOGLE_API_KEY:
-            error_logs.append("❌ API key not configured")
-            logger.error("GOOGLE_API_KEY not found in environment")
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "Configuration Error",
-                    "details": "AI service is not properly configured. Please contact support.",
-                    "logs": error_logs,
-                },
-            )
-
-        error_logs.append("✅ API key found")
-
-        # Initialize Gemini API
-        try:
-            genai.configure(api_key=GOOGLE_API_KEY)
-            model = genai.GenerativeModel("gemini-1.5-flash")
-            error_logs.append("✅ AI service initialized")
-        except Exception as e:
-            error_logs.append(f"❌ Failed to initialize AI service: {str(e)}")
-            logger.error(f"Failed to initialize Gemini: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "AI Service Error",
-                    "details": f"Could not connect to AI service: {str(e)}",
-                    "logs": error_logs,
-                },
-            )
-
-        # Prepare the system message and prompt
-        system_message = """You are a scam detection expert. Analyze ANY image for potential scams, fraud, or suspicious content. This includes:
-        - Emails and letters
-        - Social media profiles (Facebook, Instagram, LinkedIn, Twitter, etc.)
-        - Text messages and chat screenshots
-        - Announcements and notices
-        - Advertisements and promotional content
-        - Investment opportunities
-        - Dating profiles
-        - Marketplace listings
-        - Job postings
-        - Any other content that could potentially be a scam
-        
-        Your response must ALWAYS be in JSON format with this exact structure:
-        {
-            "score": <number 0-100>,
-            "risk_level": "<safe|suspicious|scam>",
-            "summary": "<brief summary in simple language>",
-            "indicators": [
-                {
-                    "title": "<indicator name>",
-                    "explanation": "<simple explanation that a grandmother can understand>",
-                    "severity": "<low|medium|high>"
-                }
-            ]
-        }
-        
-        Score guide:
-        - 0-30: Safe (legitimate or low risk)
-        - 31-60: Suspicious (needs caution, verify before trusting)
-        - 61-100: Scam (dangerous, likely fraudulent)
-        
-        Common scam indicators across all platforms:
-        
-        **Emails & Messages:**
-        - Urgent/threatening language ("act now or lose access")
-        - Requests for passwords, SSN, or banking info
-        - Suspicious sender addresses or domains
-        - Poor grammar, spelling errors, or odd formatting
-        - Unexpected prizes, refunds, or inheritance claims
-        - Suspicious links or attachments
-        
-        **Social Media Profiles:**
-        - Newly created accounts with few posts/followers
-        - Stock photos or stolen profile pictures
-        - Promises of easy money, get-rich-quick schemes
-        - Romantic advances from strangers (romance scams)
-        - Impersonation of celebrities, officials, or brands
-        - Requests to move conversation off-platform quickly
-        - No mutual friends or suspicious friend lists
-        - Profile information inconsistencies
-        
-        **Investment & Money Schemes:**
-        - Guaranteed high returns with no risk
-        - Pyramid or multi-level marketing schemes
-        - Cryptocurrency "opportunities" with urgent deadlines
-        - Requests for upfront payments or "processing fees"
-        - Pressure to invest quickly without research time
-        
-        **Marketplace & Job Postings:**
-        - Deals that are too good to be true
-        - Requests for payment via untraceable methods (gift cards, wire transfer, crypto)
-        - Job offers requiring upfront payment for training/equipment
-        - Overpayment scams with refund requests
-        - Vague job descriptions with high pay promises
-        
-        **Red Flags Across All Types:**
-        - Requests for money or gift cards
-        - Pressure tactics and artificial urgency
-        - Requests to bypass normal procedures
-        - Unsolicited contact
-        - Too good to be true offers
-        - Inconsistent or vague information
-        - Requests to keep things secret
-        - Poor communication or evasive answers
-        
-        IMPORTANT: Explain everything in simple, grandma-friendly language. Be helpful and clear about WHY something is suspicious, not just THAT it's suspicious."""
+        _ensure_ai_service(model, error_logs)
 
         # Process the base64 image
         try:
-            # Decode base64 image
-            image_data = base64.b64decode(request.image_base64)
+            # Decode base64 image off the event loop; multi-MB payloads
+            # would otherwise stall other requests
+            image_data = await asyncio.to_thread(
+                binascii.a2b_base64, request.image_base64
+            )
             error_logs.append("✅ Image content prepared")
         except Exception as e:
             error_logs.append(f"❌ Failed to process image: {str(e)}")
@@ -392,147 +816,124 @@ async def analyze_image(request: ScamAnalysisRequest):
                 },
             )
 
-        # Create the prompt
-        prompt = f"""{system_message}
+        mime_type = _detect_image_type(image_data, error_logs)
+        return await _analyze_image_data(image_data, model, error_logs, mime_type)
 
-Analyze this image for scam indicators. It could be anything - an email, social media profile, text message, advertisement, job posting, or any other content. Provide a detailed analysis with a scam score from 0-100 and explain each indicator in simple language that anyone can understand."""
-        error_logs.append("✅ Analysis request prepared")
-
-        # Send request to Gemini and get response
-        try:
-            logger.info("Sending request to AI service")
-            # Upload the image data
-            image_part = {"mime_type": "image/jpeg", "data": image_data}
-            response = model.generate_content([prompt, image_part])
-            error_logs.append("✅ AI analysis completed")
-            logger.info("Received response from AI service")
-            response_text = response.text
-        except Exception as e:
-            error_logs.append(f"❌ AI analysis failed: {str(e)}")
-            logger.error(f"AI service request failed: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "AI Analysis Failed",
-                    "details": f"The AI service encountered an error: {str(e)}. This might be a temporary issue - please try again.",
-                    "logs": error_logs,
-                },
-            )
-
-        # Parse the JSON response
-        try:
-            # Remove markdown code blocks if present
-            response_text = response.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
+    except HTTPException:
+        # Re-raise HTTP exceptions as-is
+        raise
+    except Exception as e:
+        # Catch any unexpected errors
+        raise _unexpected_analysis_error(e, error_logs)
 
-            error_logs.append(
-                f"📄 Raw AI response received ({len(response_text)} chars)"
-            )
 
-            # Parse JSON
-            analysis_data = json.loads(response_text)
-            error_logs.append("✅ Response parsed successfully")
-
-            # Validate required fields
-            required_fields = ["score", "risk_level", "indicators", "summary"]
-            missing_fields = [
-                field for field in required_fields if field not in analysis_data
-            ]
-            if missing_fields:
-                error_logs.append(
-                    f"❌ Missing fields in response: {', '.join(missing_fields)}"
-                )
-                raise ValueError(
-                    f"Missing required fields: {', '.join(missing_fields)}"
-                )
-
-            error_logs.append("✅ Response validation passed")
-
-        except json.JSONDecodeError as e:
-            error_logs.append(f"❌ JSON parsing failed: {str(e)}")
-            error_logs.append(f"📄 Response preview: {response_text[:200]}...")
-            logger.error(f"JSON parsing error: {e}")
-            logger.error(f"Response text: {response_text}")
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "Response Parsing Error",
-                    "details": f"Failed to parse AI response. The AI returned invalid data format: {str(e)}",
-                    "logs": error_logs,
-                },
-            )
-        except ValueError as e:
-            error_logs.append(f"❌ Validation failed: {str(e)}")
-            logger.error(f"Response validation error: {e}")
+@api_router.post("/analyze-binary", response_model=ScamAnalysisResponse)
+async def analyze_image_binary(
+    file: UploadFile = File(...),
+    model: Optional[genai.GenerativeModel] = Depends(get_model),
+):
+    """
+    Analyze an uploaded image file for scam indicators.
+    Accepts raw multipart bytes, avoiding the base64 payload and decode step.
+    """
+    error_logs = _new_error_logs()
+    try:
+        # Read at most one byte past the limit so oversized uploads are rejected
+        image_data = await file.read(MAX_IMAGE_BYTES + 1)
+        if not image_data:
+            error_logs.append("❌ Empty image data received")
+            logger.error("Empty image data received")
             raise HTTPException(
-                status_code=500,
+                status_code=400,
                 detail={
-                    "error": "Invalid Response Format",
-                    "details": f"AI response is missing required information: {str(e)}",
+                    "error": "Invalid Image",
+                    "details": "The image data is empty or invalid. Please try uploading a different image.",
                     "logs": error_logs,
                 },
             )
+        if len(image_data) > MAX_IMAGE_BYTES:
+            raise _image_too_large_error(error_logs)
 
-        # Create response model
-        try:
-            indicators = [ScamIndicator(**ind) for ind in analysis_data["indicators"]]
+        error_logs.append("✅ Image data validated")
+        logger.info("Starting image analysis")
 
-            result = ScamAnalysisResponse(
-                score=analysis_data["score"],
-                risk_level=analysis_data["risk_level"],
-                indicators=indicators,
-                summary=analysis_data["summary"],
-            )
-            error_logs.append("✅ Analysis completed successfully!")
-            logger.info(f"Analysis completed successfully with score: {result.score}")
+        _ensure_ai_service(model, error_logs)
 
-            return result
-        except Exception as e:
-            error_logs.append(f"❌ Failed to create response: {str(e)}")
-            logger.error(f"Failed to create response model: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "Response Creation Error",
-                    "details": f"Failed to format the analysis results: {str(e)}",
-                    "logs": error_logs,
-                },
-            )
+        mime_type = _detect_image_type(image_data, error_logs)
+        return await _analyze_image_data(image_data, model, error_logs, mime_type)
 
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
         # Catch any unexpected errors
-        error_logs.append(f"❌ Unexpected error: {str(e)}")
-        logger.error(f"Unexpected error analyzing image: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "error": "Unexpected Error",
-                "details": f"An unexpected error occurred: {str(e)}. Please try again or contact support if the issue persists.",
-                "logs": error_logs,
-            },
-        )
+        raise _unexpected_analysis_error(e, error_logs)
 
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Comma-separated list of allowed browser origins. Without it any origin is
+# allowed, but without credentials (wildcard + credentials is invalid CORS)
+allowed_origins = [
+    origin.strip()
+    for origin in os.environ.get("ALLOWED_ORIGINS", "").split(",")
+    if origin.strip()
+] or ["*"]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
+    allow_credentials="*" not in allowed_origins,
+    allow_origins=allowed_origins,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+@app.on_event("startup")
+async def init_gemini_model():
+    global gemini_model
+    if not GOOGLE_API_KEY:
+        logger.warning("GOOGLE_API_KEY not set; AI analysis is disabled")
+        return
+    try:
+        genai.configure(api_key=GOOGLE_API_KEY)
+        gemini_model = genai.GenerativeModel(
+            GEMINI_MODEL_NAME, system_instruction=SYSTEM_MESSAGE
+        )
+    except Exception as e:
+        logger.error(f"Failed to initialize Gemini: {e}")
+
+
+@app.on_event("startup")
+async def warm_up_connections():
+    """
+    Open the Gemini and Google certs connections before the first request
+    so it does not pay for DNS and TLS setup
+    """
+
+    async def warm_gemini():
+        # count_tokens is free and goes through the same async client as
+        # generate_content_async
+        if gemini_model is not None:
+            await gemini_model.count_tokens_async(ANALYSIS_PROMPT)
+
+    async def warm_google_certs():
+        await asyncio.to_thread(
+            lambda: _google_request()(GOOGLE_CERTS_URL, timeout=WARMUP_TIMEOUT_SECONDS)
+        )
+
+    results = await asyncio.gather(
+        asyncio.wait_for(warm_gemini(), WARMUP_TIMEOUT_SECONDS),
+        asyncio.wait_for(warm_google_certs(), WARMUP_TIMEOUT_SECONDS),
+        return_exceptions=True,
+    )
+    for name, result in zip(("Gemini", "Google certs"), results):
+        if isinstance(result, Exception):
+            logger.warning(f"{name} connection warm-up failed: {result!r}")
+
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
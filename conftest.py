@@ -0,0 +1,42 @@
+"""
+Shared fixtures for the backend API tests.
+Run in parallel with: pytest backend_test.py detailed_backend_test.py -n auto
+"""
+
+import httpx
+import pytest
+
+from backend_test import HEALTH_URL, create_test_image_base64
+from detailed_backend_test import create_legitimate_email_image, create_scam_email_image
+
+
+@pytest.fixture(scope="session")
+def client():
+    with httpx.Client(
+        http2=True,
+        timeout=30.0,
+        headers={"Content-Type": "application/json"},
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+    ) as client:
+        # Open the connection up front so the first test doesn't pay for
+        # DNS and the TLS handshake; real failures surface in the tests
+        try:
+            client.get(HEALTH_URL, timeout=5.0)
+        except httpx.HTTPError:
+            pass
+        yield client
+
+
+@pytest.fixture(scope="session")
+def test_image_b64():
+    return create_test_image_base64()
+
+
+@pytest.fixture(scope="session")
+def scam_image_b64():
+    return create_scam_email_image()
+
+
+@pytest.fixture(scope="session")
+def legit_image_b64():
+    return create_legitimate_email_image()
@@ -0,0 +1,30 @@
+"""
+Error-path tests for the deployed /analyze endpoint.
+Run in parallel with: pytest tests/test_analyze_errors.py -n 4
+"""
+
+import pytest
+
+from backend_test import ANALYZE_URL
+
+
+@pytest.mark.parametrize(
+    "payload, expected_statuses",
+    [
+        pytest.param({}, {422}, id="empty-request"),
+        pytest.param("invalid json", {400, 422}, id="invalid-json"),
+        pytest.param({"wrong_field": "some_value"}, {422}, id="missing-image-field"),
+        pytest.param(
+            {"image_base64": "invalid_base64_data!!!"},
+            {400, 422, 500},
+            id="invalid-base64",
+        ),
+    ],
+)
+def test_analyze_rejects_bad_input(client, payload, expected_statuses):
+    if isinstance(payload, str):
+        response = client.post(ANALYZE_URL, content=payload)
+    else:
+        response = client.post(ANALYZE_URL, json=payload)
+
+    assert response.status_code in expected_statuses, response.text
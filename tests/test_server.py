@@ -0,0 +1,235 @@
+"""
+Unit tests for the FastAPI backend with the Gemini model stubbed out.
+"""
+
+import asyncio
+import base64
+import sys
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from cachetools import TTLCache
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+import server  # noqa: E402
+
+ANALYSIS_JSON = """{
+    "score": 85,
+    "risk_level": "scam",
+    "summary": "This email pretends to be your bank.",
+    "indicators": [
+        {
+            "title": "Urgent language",
+            "explanation": "It pressures you to act right away.",
+            "severity": "high"
+        }
+    ]
+}"""
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    async def generate_content_async(self, contents):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return FakeResponse(self.text)
+
+
+def make_png_base64():
+    buffer = BytesIO()
+    Image.new("RGB", (40, 30), color="white").save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+@pytest.fixture
+def analyze(monkeypatch):
+    monkeypatch.setattr(server, "GOOGLE_API_KEY", "test-key")
+    server._analysis_cache.clear()
+
+    def post(model_text=ANALYSIS_JSON, image_base64=None):
+        server.app.dependency_overrides[server.get_model] = lambda: FakeModel(
+            model_text
+        )
+        client = TestClient(server.app)
+        return client.post(
+            "/api/analyze", json={"image_base64": image_base64 or make_png_base64()}
+        )
+
+    yield post
+    server.app.dependency_overrides.clear()
+
+
+def test_analyze_returns_result_for_fenced_json(analyze):
+    response = analyze(f"```json\n{ANALYSIS_JSON}\n```")
+
+    assert response.status_code == 200, response.text
+    result = server.ScamAnalysisResponse.model_validate(response.json())
+    assert result.score == 85
+    assert result.risk_level == "scam"
+    assert result.indicators[0].severity == "high"
+
+
+def test_analyze_salvages_json_wrapped_in_prose(analyze):
+    response = analyze(f"Here is my analysis:\n{ANALYSIS_JSON}\nStay safe!")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["score"] == 85
+
+
+def test_analyze_rejects_unsupported_image_format(analyze):
+    gif = base64.b64encode(b"GIF89a" + b"\x00" * 32).decode("ascii")
+
+    response = analyze(image_base64=gif)
+
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"]["error"] == "Unsupported Image"
+
+
+def test_analyze_rejects_oversized_payload(analyze, monkeypatch):
+    monkeypatch.setattr(server, "MAX_IMAGE_BASE64", 1024)
+
+    response = analyze(image_base64="A" * 1028)
+
+    assert response.status_code == 413, response.text
+
+
+def test_identical_images_share_one_model_call():
+    server._analysis_cache.clear()
+    model = FakeModel(ANALYSIS_JSON)
+    image_data = base64.b64decode(make_png_base64())
+
+    async def run():
+        return await asyncio.gather(
+            *(server._analyze_image_data(image_data, model, []) for _ in range(3))
+        )
+
+    results = asyncio.run(run())
+
+    assert model.calls == 1
+    assert all(result.score == 85 for result in results)
+    assert not server._inflight_analyses
+
+
+def test_downscale_flattens_transparency_onto_white():
+    img = Image.new("RGBA", (2000, 1000), (0, 0, 0, 0))
+    img.paste((0, 0, 0, 255), (100, 100, 400, 400))
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+
+    resized = Image.open(BytesIO(server._downscale_image(buffer.getvalue())))
+
+    assert resized.format == "JPEG"
+    assert max(resized.size) == server.MAX_IMAGE_DIMENSION
+    assert resized.getpixel((resized.width - 1, resized.height - 1)) > (250,) * 3
+    assert resized.getpixel((100, 100)) < (10,) * 3
+
+
+def test_downscale_skips_images_over_pixel_cap(monkeypatch):
+    monkeypatch.setattr(server, "MAX_IMAGE_PIXELS", 1500 * 1500)
+    buffer = BytesIO()
+    Image.new("RGBA", (2000, 2000), (0, 0, 0, 0)).save(buffer, format="PNG")
+
+    assert server._downscale_image(buffer.getvalue()) is None
+
+
+def test_google_id_token_is_verified_off_loop_and_cached(monkeypatch):
+    server._google_id_cache.clear()
+    calls = []
+
+    def fake_verify(token, request):
+        calls.append((threading.get_ident(), request))
+        return {"sub": "google-user", "exp": time.time() + 3600}
+
+    monkeypatch.setattr(server.id_token, "verify_oauth2_token", fake_verify)
+
+    async def run():
+        first = await server._verify_google_id_token("id-token")
+        second = await server._verify_google_id_token("id-token")
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first is second
+    assert len(calls) == 1
+    thread_id, request = calls[0]
+    assert thread_id != threading.get_ident()
+    assert isinstance(request, server.google_requests.Request)
+
+
+def test_expired_google_id_token_is_verified_again(monkeypatch):
+    server._google_id_cache.clear()
+    calls = []
+
+    def fake_verify(token, request):
+        calls.append(token)
+        return {"sub": "google-user", "exp": time.time() - 1}
+
+    monkeypatch.setattr(server.id_token, "verify_oauth2_token", fake_verify)
+
+    asyncio.run(server._verify_google_id_token("id-token"))
+    asyncio.run(server._verify_google_id_token("id-token"))
+
+    assert len(calls) == 2
+
+
+class FakeUsers:
+    def __init__(self):
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        return {"_id": query["_id"], "email": "user@example.com"}
+
+
+def test_token_cache_skips_decode_and_lookup_until_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(
+        server,
+        "_token_cache",
+        TTLCache(maxsize=10, ttl=server.TOKEN_CACHE_TTL_SECONDS, timer=lambda: now[0]),
+    )
+    users = FakeUsers()
+    monkeypatch.setattr(server, "db", SimpleNamespace(users=users))
+    decode = server.jwt.decode
+    decodes = []
+
+    def counting_decode(*args, **kwargs):
+        decodes.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(server.jwt, "decode", counting_decode)
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=server.create_access_token({"sub": "user-1"})
+    )
+
+    def get_user():
+        return asyncio.run(server.get_current_user(credentials))
+
+    first = get_user()
+    second = get_user()
+
+    assert first is second
+    assert len(decodes) == 1
+    assert users.lookups == 1
+
+    now[0] += server.TOKEN_CACHE_TTL_SECONDS + 1
+    get_user()
+
+    assert len(decodes) == 2
+    assert users.lookups == 2